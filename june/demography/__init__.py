@@ -1,2 +1,3 @@
 from .person import Person, Activities
 from .demography import Demography, Population, AgeSexGenerator
+from .people_soa import PeopleSoA, SEX_CODES, HIGH_INCOME, to_soa
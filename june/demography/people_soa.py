@@ -0,0 +1,100 @@
+from dataclasses import dataclass, field
+from typing import Iterable
+import numpy as np
+
+from june.demography.person import Person
+
+# integer encoding of person.sex, anything else is encoded as 2
+SEX_CODES = {"m": 0, "f": 1}
+# income above which a person counts as high income
+HIGH_INCOME = 70000
+
+
+@dataclass
+class PeopleSoA:
+    """
+    Columnar (structure of arrays) copy of the attributes of a population that
+    are used by the behavioural policies. Element i of every array refers to the
+    i-th person the table was built from, and strings are encoded as integers
+    so that the arrays can be passed to numba.
+
+    Parameters
+    ----------
+    ids
+        person ids
+    sex
+        sex encoded following SEX_CODES
+    ethnicity
+        1 for people whose ethnicity is "white", 0 otherwise
+    income
+        income of each person
+    political
+        1 for democratic, 0 otherwise
+    perceived_vuln
+        whether each person perceives themselves as vulnerable
+    primary_activity_spec
+        spec of the group of the primary activity of each person, or None
+
+    On construction, the demographic flags of the behavioural models are
+    computed once as the (N, 5) boolean matrix ``demo_flags``, whose columns are
+    male, white, high income, democratic and perceived vulnerability.
+    ``perceived_vuln`` is a view on the last column, so updating it in place
+    keeps the flags up to date.
+    """
+
+    ids: np.ndarray
+    sex: np.ndarray
+    ethnicity: np.ndarray
+    income: np.ndarray
+    political: np.ndarray
+    perceived_vuln: np.ndarray
+    primary_activity_spec: np.ndarray
+    demo_flags: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.demo_flags = np.column_stack(
+            (
+                self.sex == SEX_CODES["m"],
+                self.ethnicity == 1,
+                self.income > HIGH_INCOME,
+                self.political == 1,
+                self.perceived_vuln,
+            )
+        ).astype(np.bool_)
+        self.perceived_vuln = self.demo_flags[:, 4]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def to_soa(people: Iterable[Person]) -> PeopleSoA:
+    """
+    Builds the columnar table of a list of people.
+    """
+    people = list(people)
+    n_people = len(people)
+    return PeopleSoA(
+        ids=np.fromiter((person.id for person in people), np.int64, n_people),
+        sex=np.fromiter(
+            (SEX_CODES.get(person.sex, 2) for person in people), np.int8, n_people
+        ),
+        ethnicity=np.fromiter(
+            (person.ethnicity == "white" for person in people), np.int8, n_people
+        ),
+        income=np.fromiter((person.income for person in people), np.float32, n_people),
+        political=np.fromiter(
+            (person.political == "democratic" for person in people), np.int8, n_people
+        ),
+        perceived_vuln=np.fromiter(
+            (person.perceived_vulnerability for person in people), np.bool_, n_people
+        ),
+        primary_activity_spec=np.array(
+            [
+                person.primary_activity.group.spec
+                if person.primary_activity is not None
+                else None
+                for person in people
+            ],
+            dtype=object,
+        ),
+    )
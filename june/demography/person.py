@@ -55,6 +55,10 @@ class Person(dataobject):
     immunity: Immunity = None
     # infection
     dead: bool = False
+    # behaviour
+    income: float = 0.0
+    political: str = None
+    perceived_vulnerability: bool = False
 
     @classmethod
     def from_attributes(
@@ -42,6 +42,8 @@ class Interaction:
             alpha_physical=alpha_physical,
         )
         self.beta_reductions = {}
+        # group spec -> transmission multiplier of each susceptible, by person id
+        self.mask_mult = {}
 
     @classmethod
     def from_file(cls, config_filename: str = default_config_filename) -> "Interaction":
@@ -175,6 +177,7 @@ class Interaction:
             beta,
             delta_time,
         )
+        mask_mult = self.mask_mult.get(group.spec)
 
         for (
             susceptible_subgroup_id,
@@ -188,6 +191,7 @@ class Interaction:
                 infector_tensor=infector_tensor,
                 susceptible_subgroup_id=susceptible_subgroup_id,
                 subgroup_susceptibles=subgroup_susceptibles,
+                mask_mult=mask_mult,
             )
             infected_ids += new_infected_ids
             infection_ids += new_infection_ids
@@ -208,7 +212,11 @@ class Interaction:
         return infected_ids, infection_ids, interactive_group.size
 
     def _time_step_for_subgroup(
-        self, infector_tensor, susceptible_subgroup_id, subgroup_susceptibles
+        self,
+        infector_tensor,
+        susceptible_subgroup_id,
+        subgroup_susceptibles,
+        mask_mult=None,
     ):
         """
         Time step for one susceptible subgroup. We first compute the combined
@@ -218,6 +226,9 @@ class Interaction:
 
         Parameters
         ----------
+        mask_mult
+            optional array, indexed by person id, of multiplicative factors
+            applied to the transmission to each susceptible (e.g. mask wearing)
         """
         new_infected_ids = []
         new_infection_ids = []
@@ -225,8 +236,15 @@ class Interaction:
         infection_ids = list(infector_tensor.keys())
         for susceptible_id, susceptibility_dict in subgroup_susceptibles.items():
             infection_transmission_parameters = []
+            if mask_mult is not None and susceptible_id < len(mask_mult):
+                # stored in single precision, promoted for the exponential
+                mask_factor = float(mask_mult[susceptible_id])
+            else:
+                mask_factor = 1.0
             for infection_id in infector_tensor:
-                susceptibility = susceptibility_dict.get(infection_id, 1.0)
+                susceptibility = (
+                    susceptibility_dict.get(infection_id, 1.0) * mask_factor
+                )
                 infector_transmission = infector_tensor[infection_id][
                     susceptible_subgroup_id
                 ].sum()
@@ -1,23 +1,226 @@
 import datetime
-import random
-from .policy import Policy, PolicyCollection
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import Dict, Iterable
+import numpy as np
+from june.policy.policy import Policy, PolicyCollection
+from june.demography import PeopleSoA
 from june.interaction import Interaction
-from collections import defaultdict
+from .mask_kernels import assign_masks, mask_adoption_prob
+
+# integer id of every group spec known to the interaction policies, ids are
+# only ever appended so arrays built with an older mapping stay valid
+GROUP_SPEC_TO_ID: Dict[str, int] = {}
+
+
+def register_group_specs(specs: Iterable[str]):
+    for spec in specs:
+        if spec not in GROUP_SPEC_TO_ID:
+            GROUP_SPEC_TO_ID[spec] = len(GROUP_SPEC_TO_ID)
+
+
+def _scatter_by_id(ids, values, fill):
+    """
+    Returns an array indexed by person id holding ``values``, and ``fill``
+    for the ids not in ``ids``.
+    """
+    out = np.full(ids.max() + 1 if len(ids) else 0, fill, dtype=values.dtype)
+    out[ids] = values
+    return out
+
+
+class _FactorsBySex:
+    """
+    Per-person factors of a group spec that only depend on the sex code of
+    each person. They are looked up from an array of sex codes indexed by
+    person id, which is shared by every spec, instead of being stored per spec.
+    """
+
+    def __init__(self, sex_by_id: np.ndarray, factor_by_sex: np.ndarray):
+        self.sex_by_id = sex_by_id
+        self.factor_by_sex = factor_by_sex
+
+    def __len__(self):
+        return len(self.sex_by_id)
+
+    def __getitem__(self, person_id):
+        return self.factor_by_sex[self.sex_by_id[person_id]]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.factor_by_sex[self.sex_by_id], dtype=dtype)
+
+
+class BetaReductions:
+    """
+    Read only, dictionary-like view of the beta reductions array, for the
+    consumers that look the reductions up by group spec. Only the groups
+    affected by an active policy are contained, so that consumers falling back
+    on a more generic group (e.g. schools) still do.
+    """
+
+    def __init__(self, values: np.ndarray, active: np.ndarray):
+        self.values = values
+        self.active = active
+
+    def __contains__(self, spec):
+        # specs registered after the arrays were built are not affected
+        spec_id = GROUP_SPEC_TO_ID.get(spec)
+        return (
+            spec_id is not None
+            and spec_id < len(self.active)
+            and bool(self.active[spec_id])
+        )
+
+    def __getitem__(self, spec):
+        if spec in self:
+            return float(self.values[GROUP_SPEC_TO_ID[spec]])
+        return 1.0
+
+    def get(self, spec, default=None):
+        if spec in self:
+            return float(self.values[GROUP_SPEC_TO_ID[spec]])
+        return default
+
+    def __iter__(self):
+        return (spec for spec in GROUP_SPEC_TO_ID if spec in self)
+
+    def __len__(self):
+        return int(self.active.sum())
+
 
 class InteractionPolicy(Policy):
     policy_type = "interaction"
 
+    def __init__(self, start_time: str, end_time: str):
+        super().__init__(start_time, end_time)
+        self._spec_ids_arr = None
+
+    def apply_indexed(self):
+        """
+        Beta reductions of the policy as an ``(indices, values)`` pair, where
+        the indices follow GROUP_SPEC_TO_ID. The indices are cached on the
+        first call.
+        """
+        beta_reductions = self.apply()
+        if self._spec_ids_arr is None:
+            register_group_specs(beta_reductions)
+            self._spec_ids_arr = np.array(
+                [GROUP_SPEC_TO_ID[spec] for spec in beta_reductions], dtype=np.int64
+            )
+        values = np.fromiter(
+            beta_reductions.values(), dtype=np.float32, count=len(beta_reductions)
+        )
+        return self._spec_ids_arr, values
+
+    def per_person_factor(self, interaction: Interaction, people_soa: PeopleSoA):
+        """
+        Multiplicative factors the policy applies to the transmission of each
+        susceptible, as a dictionary mapping group specs to arrays indexed by
+        person id, or None if the policy does not act on individuals. When they
+        are used, the beta reductions of the policy are not.
+        """
+        return None
+
+
 class InteractionPolicies(PolicyCollection):
     policy_type = "interaction"
-    
-    def apply(self, date: datetime, interaction: Interaction):
+
+    def __init__(self, policies):
+        super().__init__(policies)
+        # (start, end, position, policy), sorted by start day ordinal
+        self._policies_by_start = sorted(
+            (
+                (policy.start_ord, policy.end_ord, i, policy)
+                for i, policy in enumerate(policies)
+            ),
+            key=lambda entry: entry[:3],
+        )
+        self._start_ordinals = [entry[0] for entry in self._policies_by_start]
+        # day ordinal of the last call to get_active, and its result
+        self._active_ordinal = None
+        self._active_policies = ()
+        # last per-person factors combined, and what they were combined from
+        self._mask_mults = ()
+        self._mask_mult = {}
+
+    def get_active(self, date: datetime):
+        """
+        Policies active on ``date``, in their original order. Policy windows
+        start and end at midnight, so whole days can be compared, and the
+        result is reused for every time step of the same day.
+        """
+        ordinal = date.toordinal()
+        if ordinal != self._active_ordinal:
+            n_started = bisect_right(self._start_ordinals, ordinal)
+            active = [
+                (i, policy)
+                for _, end, i, policy in self._policies_by_start[:n_started]
+                if ordinal < end
+            ]
+            self._active_ordinal = ordinal
+            self._active_policies = tuple(
+                policy for _, policy in sorted(active, key=lambda x: x[0])
+            )
+        return self._active_policies
+
+    def _combine_mask_mults(self, mask_mults):
+        """
+        Multiplies together the per-person factors of several policies, group
+        spec by group spec. The result is reused until any of them changes.
+        """
+        if len(mask_mults) == 1:
+            return mask_mults[0]
+        if len(mask_mults) != len(self._mask_mults) or any(
+            new is not old for new, old in zip(mask_mults, self._mask_mults)
+        ):
+            combined = {}
+            for mask_mult in mask_mults:
+                for spec, factors in mask_mult.items():
+                    if spec in combined:
+                        combined[spec] = np.multiply(combined[spec], factors)
+                    else:
+                        combined[spec] = factors
+            self._mask_mults = tuple(mask_mults)
+            self._mask_mult = combined
+        return self._mask_mult
+
+    def apply(
+        self, date: datetime, interaction: Interaction, people_soa: PeopleSoA = None
+    ):
+        """
+        Sets the beta reductions of the active policies on the interaction and,
+        if a population is given, the combined per-person transmission factors
+        of the active policies that act on individuals (``interaction.mask_mult``).
+        The latter are left out of the beta reductions, so that their effect is
+        not counted twice.
+        """
+        register_group_specs(interaction.betas)
         active_policies = self.get_active(date)
-        beta_reductions = defaultdict(lambda: 1.0)
+        mask_mults = []
+        indexed_reductions = []
         for policy in active_policies:
-            beta_reductions_dict = policy.apply()
-            for group in beta_reductions_dict:
-                beta_reductions[group] *= beta_reductions_dict[group]
-        interaction.beta_reductions = beta_reductions
+            mask_mult = None
+            if people_soa is not None:
+                mask_mult = policy.per_person_factor(interaction, people_soa)
+            if mask_mult is None:
+                # registers the specs of the policy, before the arrays are sized
+                indexed_reductions.append(policy.apply_indexed())
+            else:
+                mask_mults.append(mask_mult)
+        # reductions are bounded in [0, 1] and sampled from, single precision
+        # is enough and halves the memory traffic
+        beta_reductions = np.ones(len(GROUP_SPEC_TO_ID), dtype=np.float32)
+        active = np.zeros(len(GROUP_SPEC_TO_ID), dtype=bool)
+        for indices, values in indexed_reductions:
+            np.multiply.at(beta_reductions, indices, values)
+            active[indices] = True
+        interaction.beta_reductions_arr = beta_reductions
+        interaction.beta_reductions = BetaReductions(beta_reductions, active)
+        if mask_mults:
+            interaction.mask_mult = self._combine_mask_mults(mask_mults)
+        else:
+            interaction.mask_mult = {}
+
 
 class SocialDistancing(InteractionPolicy):
     policy_subtype = "beta_factor"
@@ -25,7 +228,8 @@ class SocialDistancing(InteractionPolicy):
     def __init__(self, start_time: str, end_time: str, beta_factors: dict = None):
         super().__init__(start_time, end_time)
         self.beta_factors = beta_factors
-    
+        register_group_specs(beta_factors or {})
+
     def apply(self):
         """
         Implement social distancing policy
@@ -45,6 +249,7 @@ class SocialDistancing(InteractionPolicy):
         """
         return self.beta_factors
 
+
 class MaskWearing(InteractionPolicy):
     policy_subtype = "beta_factor"
     
@@ -57,7 +262,8 @@ class MaskWearing(InteractionPolicy):
         beta_factor_male: float = None,  # Added male-specific factor
         beta_factor_female: float = None,  # Added female-specific factor
         mask_probabilities: dict = None,
-        behavioral_model: bool = False, 
+        behavioral_model: bool = False,
+        seed: int = None,
     ):
         super().__init__(start_time, end_time)
         self.compliance = compliance
@@ -76,41 +282,80 @@ class MaskWearing(InteractionPolicy):
             "vulnerability_high": 3.571090,
             "intercept": 4.540417
         }
-        # Track if original transmission function has been saved
-        self._original_transmission_func_saved = False
+        # in the order of the columns of PeopleSoA.demo_flags
+        self._log_intercept = np.log(self.odds_ratios["intercept"])
+        self._log_ratios = np.log(
+            [
+                self.odds_ratios["male"],
+                self.odds_ratios["white"],
+                self.odds_ratios["income_high"],
+                self.odds_ratios["democratic"],
+                self.odds_ratios["vulnerability_high"],
+            ]
+        )
+        # mask probabilities as a plain array indexed by GROUP_SPEC_TO_ID, so
+        # that it can be passed to the numba kernels
+        register_group_specs(mask_probabilities or {})
+        self._spec_ids = {
+            spec: GROUP_SPEC_TO_ID[spec] for spec in (mask_probabilities or {})
+        }
+        self._mask_prob_arr = np.zeros(len(GROUP_SPEC_TO_ID), dtype=np.float32)
+        for spec, spec_id in self._spec_ids.items():
+            self._mask_prob_arr[spec_id] = mask_probabilities[spec]
+        self._update_group_factors()
+        # Random numbers are drawn in bulk, into a buffer reused every step
+        self._rng = np.random.default_rng(seed)
+        self._rand_buf = np.empty(0, dtype=np.float64)
+        # Per-person state, ordered as the last population given to the policy
+        self._people_soa = None
+        self._mask_factor = None
+        self._mask_mult = None
     
-    def calculate_mask_adoption_probability(self, person):
+    def _update_group_factors(self):
         """
-        Calculate the probability that an agent will adopt mask wearing
+        Precomputes the beta factor of each sex code, the reduction of the
+        transmission for people in a group where masks are worn as a
+        (sex code, spec id) table, and the (default) reductions returned by
+        ``apply``. Must be called
+        again if ``compliance`` or the beta factors are changed.
+        """
+        # rows follow SEX_CODES
+        self._bf_by_sex = np.array(
+            [self.beta_factor_male, self.beta_factor_female, self.beta_factor],
+            dtype=np.float32,
+        )
+        self._group_factors = 1 - (
+            self._mask_prob_arr[np.newaxis, :]
+            * self.compliance
+            * (1 - self._bf_by_sex[:, np.newaxis])
+        )
+        self._apply_cache = MappingProxyType(
+            {
+                spec: float(self._group_factors[2, spec_id])
+                for spec, spec_id in self._spec_ids.items()
+            }
+        )
+        self._mask_mult = None
+
+    def calculate_mask_adoption_probabilities(
+        self, people_soa: PeopleSoA
+    ) -> np.ndarray:
+        """
+        Calculate the probability that each agent will adopt mask wearing
         based on their characteristics and perceived vulnerability.
         Based on Anderson et al. framework.
+
+        The odds ratios are combined in log space, so the probabilities of
+        the whole population come from a single sweep over the demographic
+        flags precomputed in ``people_soa``.
         """
         if not self.behavioral_model:
-            return self.compliance  # Use standard compliance if not using behavioral model
-        
-        # Start with intercept
-        odds = self.odds_ratios["intercept"]
-        
-        # Apply person characteristics
-        if hasattr(person, "sex") and person.sex == "m":
-            odds *= self.odds_ratios["male"]
-        
-        if hasattr(person, "ethnicity") and person.ethnicity == "white":
-            odds *= self.odds_ratios["white"]
-        
-        if hasattr(person, "income") and person.income > 70000:
-            odds *= self.odds_ratios["income_high"]
-        
-        if hasattr(person, "political") and person.political == "democratic":
-            odds *= self.odds_ratios["democratic"]
-        
-        if hasattr(person, "perceived_vulnerability") and person.perceived_vulnerability:
-            odds *= self.odds_ratios["vulnerability_high"]
-        
-        # Calculate probability
-        probability = odds / (1 + odds)
-        return probability	
-        
+            # Use standard compliance if not using behavioral model
+            return np.full(len(people_soa), self.compliance, dtype=np.float64)
+        return mask_adoption_prob(
+            people_soa.demo_flags, self._log_intercept, self._log_ratios
+        )
+
     def apply(self):
         """
         Implement mask wearing policy
@@ -124,106 +369,88 @@ class MaskWearing(InteractionPolicy):
           but with a mean field effect in beta reduction
         - Currently we assume that the changes are group dependent
         - The beta_factor is now demographic-specific (male/female)
+        - With the behavioral model, the reduction is still the compliance based
+          expectation, the draws of apply_to_population only act through the
+          per-person factors
+        - The reductions are computed once, by _update_group_factors, and
+          returned as a read only mapping shared by every call
         """
-        ret = {}
-        for key, value in self.mask_probabilities.items():
-            # For now, use the default beta_factor as we modify the person-specific values elsewhere
-            ret[key] = 1 - (value * self.compliance * (1 - self.beta_factor))
-        return ret
+        return self._apply_cache
     
-    def apply_to_person(self, person):
+    def _set_population(self, people_soa: PeopleSoA):
+        if people_soa is self._people_soa:
+            return
+        self._people_soa = people_soa
+        self._mask_factor = None
+        self._mask_mult = None
+
+    def apply_to_population(self, people_soa: PeopleSoA):
         """
-        Apply mask wearing based on person's demographics
-        
-        This method should be called for each person when processing interactions
+        Apply mask wearing to a whole population at once, based on the
+        demographics of each person.
+
+        Returns whether each person wears a mask and their mask factor, as
+        arrays in the same order as ``people_soa``.
+        """
+        self._set_population(people_soa)
+        n_people = len(people_soa)
+        adoption_probabilities = self.calculate_mask_adoption_probabilities(
+            people_soa
+        )
+        wears_mask = np.empty(n_people, dtype=np.bool_)
+        mask_factor = np.empty(n_people, dtype=np.float32)
+        if len(self._rand_buf) != n_people:
+            self._rand_buf = np.empty(n_people, dtype=np.float64)
+        self._rng.random(out=self._rand_buf)
+        assign_masks(
+            people_soa.sex,
+            self._rand_buf,
+            adoption_probabilities,
+            self._bf_by_sex,
+            wears_mask,
+            mask_factor,
+        )
+        self._mask_factor = mask_factor
+        self._mask_mult = None
+        return wears_mask, mask_factor
+
+    def _get_mask_mult(self, interaction: Interaction):
         """
+        Multiplicative factors applied to the transmission of each susceptible,
+        as a dictionary mapping group specs to arrays indexed by person id.
+        """
+        ids = self._people_soa.ids
         if self.behavioral_model:
-            # Use behavioral model to determine mask adoption
-            mask_prob = self.calculate_mask_adoption_probability(person)
-            person.wears_mask = random.random() < mask_prob
-        else:
-            # Use standard compliance approach
-            person.wears_mask = random.random() < self.compliance
-            
-        # Apply gender-specific mask factor if wearing mask
-        if person.wears_mask:
-            if hasattr(person, 'sex'):
-                if person.sex == "m":
-                    person.mask_factor = self.beta_factor_male
-                elif person.sex == "f":
-                    person.mask_factor = self.beta_factor_female
-                else:
-                    person.mask_factor = self.beta_factor
-            else:
-                person.mask_factor = self.beta_factor
-        else:
-            person.mask_factor = 1.0  # No reduction
-    
-    def apply_to_interaction(self, date: datetime, interaction: Interaction):
-        """
-        Apply mask policy to the interaction module
-        This modifies the interaction module's transmission calculation
-        """
-        if self.start_time <= date <= self.end_time:
-            # Store the original method if not already stored
-            if not self._original_transmission_func_saved:
-                if hasattr(interaction, "_original_calculate_transmission"):
-                    # Already saved by another instance, use that one
-                    pass
-                else:
-                    # Save the original method
-                    interaction._original_calculate_transmission = interaction.calculate_transmission
-                self._original_transmission_func_saved = True
-                
-                # Create a wrapper that applies gender-specific factors
-                def gender_specific_transmission_wrapper(self_interaction, susceptible, infected, group, delta_time, **kwargs):
-                    # Call original method to get base transmission probability
-                    transmission_prob = interaction._original_calculate_transmission(
-                        susceptible, infected, group, delta_time, **kwargs
-                    )
-                    
-                    # If using behavioral model, check if person is wearing mask
-                    if self.behavioral_model:
-                        if hasattr(susceptible, "wears_mask") and susceptible.wears_mask:
-                            if hasattr(susceptible, "sex"):
-                                if susceptible.sex == "m":
-                                    transmission_prob *= self.beta_factor_male
-                                elif susceptible.sex == "f":
-                                    transmission_prob *= self.beta_factor_female
-                                else:
-                                    transmission_prob *= self.beta_factor
-                            else:
-                                transmission_prob *= self.beta_factor
-                    else:
-                        # If not using behavioral model, use standard approach
-                        # Apply reduction based on location and compliance
-                        group_factor = 1.0
-                        if hasattr(group, "spec") and group.spec in self.mask_probabilities:
-                            # Apply gender-specific factors
-                            if hasattr(susceptible, "sex"):
-                                if susceptible.sex == "m":
-                                    group_factor = 1 - (self.mask_probabilities[group.spec] * 
-                                                      self.compliance * (1 - self.beta_factor_male))
-                                elif susceptible.sex == "f":
-                                    group_factor = 1 - (self.mask_probabilities[group.spec] * 
-                                                      self.compliance * (1 - self.beta_factor_female))
-                                else:
-                                    group_factor = 1 - (self.mask_probabilities[group.spec] * 
-                                                      self.compliance * (1 - self.beta_factor))
-                            else:
-                                group_factor = 1 - (self.mask_probabilities[group.spec] * 
-                                                  self.compliance * (1 - self.beta_factor))
-                        
-                        transmission_prob *= group_factor
-                    
-                    return transmission_prob
-                
-                # Replace the original method with our wrapper
-                interaction.calculate_transmission = lambda *args, **kwargs: gender_specific_transmission_wrapper(
-                    interaction, *args, **kwargs
-                )
-        else:
-            # Outside policy period, restore original method if we modified it
-            if self._original_transmission_func_saved and hasattr(interaction, "_original_calculate_transmission"):
-                interaction.calculate_transmission = interaction._original_calculate_transmission
-                self._original_transmission_func_saved = False
\ No newline at end of file
+            # people decide individually whether they wear a mask, and wear
+            # it wherever they go. Until apply_to_population has drawn who
+            # does, the policy only acts through its group reductions
+            if self._mask_factor is None:
+                return None
+            mask_mult = _scatter_by_id(ids, self._mask_factor, 1.0)
+            return {spec: mask_mult for spec in interaction.betas}
+        # mean field reduction in the groups where masks are worn, which only
+        # depends on the sex of the susceptible. Ids missing from the
+        # population get an extra code, whose factor is neutral
+        neutral = self._group_factors.shape[0]
+        sex_by_id = _scatter_by_id(ids, self._people_soa.sex, neutral)
+        factors = np.vstack(
+            [self._group_factors, np.ones_like(self._group_factors[:1])]
+        )
+        return {
+            spec: _FactorsBySex(sex_by_id, factors[:, spec_id])
+            for spec, spec_id in self._spec_ids.items()
+        }
+
+    def per_person_factor(self, interaction: Interaction, people_soa: PeopleSoA):
+        """
+        Per-person transmission factors of the mask policy, see
+        ``InteractionPolicy.per_person_factor``. These are only recomputed when
+        the population has been re-evaluated. With the behavioral model, they
+        depend on the random draws of the last call to ``apply_to_population``
+        on ``people_soa``, which this method never makes itself, and are None
+        before it.
+        """
+        self._set_population(people_soa)
+        if self._mask_mult is None:
+            self._mask_mult = self._get_mask_mult(interaction)
+        return self._mask_mult
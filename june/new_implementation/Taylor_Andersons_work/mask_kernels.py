@@ -0,0 +1,89 @@
+"""
+Numba kernels of the mask wearing policy.
+
+The kernels are jit compiled with ``cache=True``, so the compilation only
+happens on the first run, but that first run can still take tens of seconds.
+They can also be compiled ahead of time into the ``june_mask_kernels``
+extension module, next to this file, with
+
+    python mask_kernels.py
+
+Ahead of time compilation does not support ``parallel=True``, so the compiled
+kernels run on a single thread, and numba.pycc is pending deprecation. They
+are therefore only used when the environment variable JUNE_MASK_KERNELS_AOT
+is set to 1, e.g. for short runs dominated by the first compilation.
+"""
+import logging
+import os
+import numpy as np
+import numba as nb
+
+logger = logging.getLogger(__name__)
+
+
+def _assign_masks(sex, rand, prob, bf_by_sex, out_wear, out_factor):
+    """
+    Decides who wears a mask given their adoption probabilities and
+    stores the (sex specific) beta factor of those wearing one, gathered from
+    ``bf_by_sex`` with the sex code of each person.
+    """
+    for i in nb.prange(sex.shape[0]):
+        wears = rand[i] < prob[i]
+        out_wear[i] = wears
+        out_factor[i] = 1.0 + wears * (bf_by_sex[sex[i]] - 1.0)
+
+
+def _mask_adoption_prob(demo_flags, log_intercept, log_ratios):
+    """
+    Probability that each person adopts a mask, combining the odds ratios of
+    their demographic flags in log space.
+    """
+    n_people, n_flags = demo_flags.shape
+    prob = np.empty(n_people)
+    for i in nb.prange(n_people):
+        log_odds = log_intercept
+        for j in range(n_flags):
+            if demo_flags[i, j]:
+                log_odds += log_ratios[j]
+        prob[i] = 1.0 / (1.0 + np.exp(-log_odds))
+    return prob
+
+
+assign_masks = nb.njit(parallel=True, cache=True)(_assign_masks)
+mask_adoption_prob = nb.njit(parallel=True, cache=True)(_mask_adoption_prob)
+
+if os.environ.get("JUNE_MASK_KERNELS_AOT") == "1":
+    try:
+        from .june_mask_kernels import assign_masks, mask_adoption_prob  # noqa
+    except ImportError:
+        logger.warning(
+            "JUNE_MASK_KERNELS_AOT is set but june_mask_kernels has not been "
+            "built, using the jit compiled kernels"
+        )
+
+# signatures of the ahead of time compiled kernels, which only accept these
+# dtypes (see PeopleSoA and MaskWearing)
+AOT_SIGNATURES = {
+    "assign_masks": "void(i1[:], f8[:], f8[:], f4[:], b1[:], f4[:])",
+    "mask_adoption_prob": "f8[:](b1[:, :], f8, f8[:])",
+}
+
+
+def build_aot(output_dir: str = None):
+    """
+    Compiles the kernels ahead of time into the ``june_mask_kernels``
+    extension module, by default next to this file.
+    """
+    from numba.pycc import CC
+
+    cc = CC("june_mask_kernels")
+    cc.output_dir = output_dir or os.path.dirname(os.path.abspath(__file__))
+    cc.export("assign_masks", AOT_SIGNATURES["assign_masks"])(_assign_masks)
+    cc.export("mask_adoption_prob", AOT_SIGNATURES["mask_adoption_prob"])(
+        _mask_adoption_prob
+    )
+    cc.compile()
+
+
+if __name__ == "__main__":
+    build_aot()
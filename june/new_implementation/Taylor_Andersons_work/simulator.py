@@ -1,7 +1,6 @@
 import logging
 import datetime
 import yaml
-import random
 from typing import Optional, List
 from pathlib import Path
 from time import perf_counter
@@ -20,7 +19,12 @@ from june.event import Events
 from june.time import Timer
 from june.records import Record
 from june.world import World
-from june.policy.interaction_policies import MaskWearing
+from june.new_implementation.Taylor_Andersons_work.interaction_policies import (
+    InteractionPolicy,
+    InteractionPolicies,
+    MaskWearing,
+)
+from june.demography import to_soa
 from june.mpi_setup import mpi_comm, mpi_size, mpi_rank
 
 default_config_filename = paths.configs_path / "config_example.yaml"
@@ -119,6 +123,10 @@ class Simulator:
         self.record = record
         if self.record is not None and self.record.record_static_data:
             self.record.static_data(world=world)
+        self._people_soa = None
+        # interaction policies of the activity manager, and the collection used
+        # to apply them
+        self._interaction_policies = (None, None)
 
     @classmethod
     def from_file(
@@ -211,6 +219,39 @@ class Simulator:
             reset_infections=reset_infections,
         )
 
+    def _get_people_soa(self):
+        """
+        Columnar table of the population used by the mask wearing policies,
+        built on first use since the demographics do not change.
+        """
+        if self._people_soa is None:
+            self._people_soa = to_soa(self.world.people.members)
+        return self._people_soa
+
+    def _get_interaction_policies(self):
+        """
+        Collection used to apply the interaction policies. Policies from the
+        prototype interaction_policies module next to this file (e.g. loaded
+        with Policies.from_file(base_policy_modules=(
+        "june.new_implementation.Taylor_Andersons_work.interaction_policies",
+        "june.policy"))) are applied by its InteractionPolicies, which also
+        takes the per-person mask factors into account. Any other policies
+        are applied by june.policy's InteractionPolicies as usual.
+        """
+        interaction_policies = self.activity_manager.policies.interaction_policies
+        if interaction_policies is not self._interaction_policies[0]:
+            collection = interaction_policies
+            if not isinstance(interaction_policies, InteractionPolicies) and (
+                interaction_policies.policies
+                and all(
+                    isinstance(policy, InteractionPolicy)
+                    for policy in interaction_policies
+                )
+            ):
+                collection = InteractionPolicies(interaction_policies.policies)
+            self._interaction_policies = (interaction_policies, collection)
+        return self._interaction_policies[1]
+
     def clear_world(self):
         """
         Removes everyone from all possible groups, and sets everyone's busy attribute
@@ -244,26 +285,19 @@ class Simulator:
         
         # Update perceived vulnerability for each person if behavioral masks are enabled
         if self.activity_manager.policies is not None:
-            # Apply standard policies
-            self.activity_manager.policies.interaction_policies.apply(
-                date=self.timer.date, interaction=self.interaction
-            )
-            
+            interaction_policies = self._get_interaction_policies()
             # Look for behavioral mask policies
             behavioral_mask_policy = None
-            for policy in self.activity_manager.policies.interaction_policies.policies:
-                if isinstance(policy, MaskWearing) and hasattr(policy, "behavioral_model") and policy.behavioral_model:
+            for policy in interaction_policies:
+                if isinstance(policy, MaskWearing) and policy.behavioral_model:
                     behavioral_mask_policy = policy
                     break
                     
             # If using behavioral mask model, update vulnerability perceptions
             if behavioral_mask_policy is not None:
                 # Update perceived vulnerability based on infected classmates/coworkers
-                for person in self.world.people.members:
-                    # Initialize perceived vulnerability attribute if needed
-                    if not hasattr(person, "perceived_vulnerability"):
-                        person.perceived_vulnerability = False
-                    
+                people_soa = self._get_people_soa()
+                for i, person in enumerate(self.world.people.members):
                     # Reset vulnerability perception to be recalculated
                     person.perceived_vulnerability = False
                     
@@ -282,23 +316,34 @@ class Simulator:
                     
                     # Update vulnerability perception
                     person.perceived_vulnerability = has_quarantined_contact
-                    
-                    # Calculate probability of wearing mask
-                    mask_prob = behavioral_mask_policy.calculate_mask_adoption_probability(person)
-                    
-                    # Decide if mask is worn
-                    person.wears_mask = random.random() < mask_prob
-                    
-                    # Log decision
-                    rank_logger.info(f"Person {person.id} vulnerability: {person.perceived_vulnerability}, "
-                                    f"mask probability: {mask_prob}, wears_mask: {person.wears_mask}")
+                    people_soa.perceived_vuln[i] = has_quarantined_contact
+                
+                # Decide who wears a mask, for the whole population at once
+                wears_mask, _ = behavioral_mask_policy.apply_to_population(
+                    people_soa
+                )
+                rank_logger.info(
+                    f"Mask wearing: {int(wears_mask.sum())} out of {len(wears_mask)} people"
+                )
             
-            # Apply gender-specific mask policies            
-            for policy in self.activity_manager.policies.interaction_policies.policies:
-                if isinstance(policy, MaskWearing) and hasattr(policy, "apply_to_interaction"):
-                    policy.apply_to_interaction(
-                        date=self.timer.date, interaction=self.interaction
-                    )
+            # Apply interaction policies, after the mask decisions they depend on.
+            # Prototype mask policies act on individuals through the population
+            # table
+            if isinstance(interaction_policies, InteractionPolicies):
+                people_soa = None
+                if any(
+                    isinstance(policy, MaskWearing) for policy in interaction_policies
+                ):
+                    people_soa = self._get_people_soa()
+                interaction_policies.apply(
+                    date=self.timer.date,
+                    interaction=self.interaction,
+                    people_soa=people_soa,
+                )
+            else:
+                interaction_policies.apply(
+                    date=self.timer.date, interaction=self.interaction
+                )
             
             # Apply regional compliance policies
             self.activity_manager.policies.regional_compliance.apply(
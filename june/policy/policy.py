@@ -30,6 +30,10 @@ class Policy(ABC):
         self.spec = self.get_spec()
         self.start_time = read_date(start_time)
         self.end_time = read_date(end_time)
+        # the dates are at midnight, so comparing day ordinals is exact and
+        # cheaper than comparing datetimes
+        self.start_ord = self.start_time.toordinal()
+        self.end_ord = self.end_time.toordinal()
 
     def get_spec(self) -> str:
         """
@@ -46,7 +50,7 @@ class Policy(ABC):
         date:
             date to check
         """
-        return self.start_time <= date < self.end_time
+        return self.start_ord <= date.toordinal() < self.end_ord
 
     def initialize(self, world, date, record=None):
         pass
@@ -0,0 +1,54 @@
+import numpy as np
+
+from june.demography import Person, to_soa
+
+
+class TestPeopleSoA:
+    def test__columns_follow_people(self):
+        people = [
+            Person.from_attributes(sex="m", ethnicity="white"),
+            Person.from_attributes(sex="f", ethnicity="C2"),
+        ]
+        people[0].income = 80000
+        people[1].political = "democratic"
+        people[1].perceived_vulnerability = True
+        people_soa = to_soa(people)
+        assert len(people_soa) == 2
+        assert list(people_soa.ids) == [person.id for person in people]
+        assert list(people_soa.sex) == [0, 1]
+        assert list(people_soa.ethnicity) == [1, 0]
+        assert np.allclose(people_soa.income, [80000, 0])
+        assert list(people_soa.political) == [0, 1]
+        assert list(people_soa.perceived_vuln) == [False, True]
+        assert list(people_soa.primary_activity_spec) == [None, None]
+
+    def test__demographic_flags(self):
+        people = [
+            Person.from_attributes(sex="m", ethnicity="white"),
+            Person.from_attributes(sex="f", ethnicity="C2"),
+        ]
+        people[0].income = 80000
+        people[1].political = "democratic"
+        people_soa = to_soa(people)
+        assert people_soa.demo_flags.tolist() == [
+            [True, True, True, False, False],
+            [False, False, False, True, False],
+        ]
+        # perceived vulnerability is updated in place every time step
+        people_soa.perceived_vuln[1] = True
+        assert people_soa.demo_flags[1, 4]
+
+    def test__only_white_counts_as_white(self):
+        people = [
+            Person.from_attributes(ethnicity="white"),
+            Person.from_attributes(ethnicity="A1"),
+            Person.from_attributes(ethnicity=""),
+            Person.from_attributes(ethnicity=None),
+        ]
+        assert list(to_soa(people).ethnicity) == [1, 0, 0, 0]
+
+    def test__empty_population(self):
+        people_soa = to_soa([])
+        assert len(people_soa) == 0
+        assert people_soa.sex.dtype == np.int8
+        assert people_soa.demo_flags.shape == (0, 5)
@@ -116,6 +116,20 @@ class TestInteractionFunctions:
         assert np.isclose(len(blames2[blames2 == 6]), 0.2 / 0.6 * n, rtol=0.1)
         assert np.isclose(len(blames2[blames2 == 7]), 0.3 / 0.6 * n, rtol=0.1)
 
+    def test__mask_mult_protects_susceptibles(self):
+        interaction = Interaction.from_file(config_filename=test_config)
+        infector_tensor = {"a": np.array([[100.0]])}
+        subgroup_susceptibles = {0: {}, 1: {}, 2: {}}
+        mask_mult = np.array([0.0, 1.0])
+        infected_ids, _, _ = interaction._time_step_for_subgroup(
+            infector_tensor=infector_tensor,
+            susceptible_subgroup_id=0,
+            subgroup_susceptibles=subgroup_susceptibles,
+            mask_mult=mask_mult,
+        )
+        # id 0 is fully protected, id 2 is not covered by the multipliers
+        assert sorted(infected_ids) == [1, 2]
+
 
 def days_to_infection(interaction, susceptible_person, group, people, n_students):
     delta_time = 1 / 24
@@ -41,4 +41,6 @@ class TestPolicy:
         policy = Policy(start_time="2020-5-6", end_time="2020-6-6")
         assert policy.is_active(datetime(2020, 5, 6))
         assert policy.is_active(datetime(2020, 6, 5))
+        assert policy.is_active(datetime(2020, 6, 5, 23))
+        assert not policy.is_active(datetime(2020, 5, 5, 23))
         assert not policy.is_active(datetime(2020, 6, 6))
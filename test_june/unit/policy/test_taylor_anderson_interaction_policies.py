@@ -0,0 +1,385 @@
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from june import paths
+from june.demography import Person, to_soa
+from june.interaction import Interaction
+from june.new_implementation.Taylor_Andersons_work.interaction_policies import (
+    GROUP_SPEC_TO_ID,
+    BetaReductions,
+    InteractionPolicies,
+    MaskWearing,
+    SocialDistancing,
+    register_group_specs,
+)
+from june.new_implementation.Taylor_Andersons_work.mask_kernels import (
+    assign_masks,
+    mask_adoption_prob,
+)
+
+interaction_config = paths.configs_path / "tests/interaction.yaml"
+
+
+@pytest.fixture(name="interaction")
+def make_interaction():
+    return Interaction.from_file(config_filename=interaction_config)
+
+
+@pytest.fixture(name="policies")
+def make_policies():
+    return [
+        SocialDistancing(
+            start_time="2020-03-02",
+            end_time="2020-03-10",
+            beta_factors={"pub": 0.7, "school": 0.5, "household": 1.0},
+        ),
+        MaskWearing(
+            start_time="2020-03-05",
+            end_time="2020-03-20",
+            compliance=0.8,
+            beta_factor=0.5,
+            beta_factor_male=0.6,
+            beta_factor_female=0.3,
+            mask_probabilities={"pub": 1.0, "school": 0.5, "grocery": 0.9},
+        ),
+        SocialDistancing(
+            start_time="2020-03-08",
+            end_time="2020-03-12",
+            beta_factors={"pub": 0.9, "cinema": 0.4},
+        ),
+    ]
+
+
+@pytest.fixture(name="people")
+def make_people():
+    people = [
+        Person.from_attributes(sex="m", ethnicity="white"),
+        Person.from_attributes(sex="f", ethnicity="C2"),
+        Person.from_attributes(sex="m", ethnicity=None),
+        Person.from_attributes(sex="f", ethnicity="white"),
+    ]
+    people[0].income = 80000
+    people[1].political = "democratic"
+    people[2].perceived_vulnerability = True
+    people[3].income = 90000
+    people[3].political = "democratic"
+    people[3].perceived_vulnerability = True
+    return people
+
+
+def baseline_beta_reductions(policies, date):
+    beta_reductions = defaultdict(lambda: 1.0)
+    for policy in policies:
+        if policy.is_active(date):
+            for group, reduction in policy.apply().items():
+                beta_reductions[group] *= reduction
+    return beta_reductions
+
+
+class TestBetaReductions:
+    def test__match_baseline(self, policies, interaction):
+        interaction_policies = InteractionPolicies(policies)
+        for day in range(1, 22):
+            date = datetime(2020, 3, day, 8)
+            interaction_policies.apply(date=date, interaction=interaction)
+            expected = baseline_beta_reductions(policies, date)
+            assert set(interaction.beta_reductions) == set(expected)
+            for spec in list(interaction.betas) + ["grocery", "cinema"]:
+                assert interaction.beta_reductions[spec] == pytest.approx(
+                    expected[spec], rel=1e-6
+                )
+
+    def test__spec_not_in_betas(self, interaction):
+        assert "primary_school" not in interaction.betas
+        interaction_policies = InteractionPolicies(
+            [
+                SocialDistancing(
+                    start_time="2020-03-02",
+                    end_time="2020-03-10",
+                    beta_factors={"primary_school": 0.5, "pub": 0.7},
+                )
+            ]
+        )
+        interaction_policies.apply(date=datetime(2020, 3, 6), interaction=interaction)
+        assert set(interaction.beta_reductions) == {"primary_school", "pub"}
+        assert interaction.beta_reductions["primary_school"] == pytest.approx(0.5)
+
+    def test__dictionary_view(self):
+        register_group_specs(["pub", "school"])
+        values = np.ones(len(GROUP_SPEC_TO_ID), dtype=np.float32)
+        active = np.zeros(len(GROUP_SPEC_TO_ID), dtype=np.bool_)
+        values[GROUP_SPEC_TO_ID["pub"]] = 0.5
+        active[GROUP_SPEC_TO_ID["pub"]] = True
+        beta_reductions = BetaReductions(values, active)
+        assert "pub" in beta_reductions
+        assert "school" not in beta_reductions
+        assert "not_a_group" not in beta_reductions
+        assert beta_reductions["pub"] == 0.5
+        assert beta_reductions["school"] == 1.0
+        assert beta_reductions.get("school") is None
+        assert beta_reductions.get("school", 0.3) == 0.3
+        assert list(beta_reductions) == ["pub"]
+        assert len(beta_reductions) == 1
+
+    def test__spec_registered_after_the_view(self):
+        register_group_specs(["pub"])
+        values = np.ones(len(GROUP_SPEC_TO_ID), dtype=np.float32)
+        active = np.ones(len(GROUP_SPEC_TO_ID), dtype=np.bool_)
+        beta_reductions = BetaReductions(values, active)
+        register_group_specs(["registered_after_the_view"])
+        assert "registered_after_the_view" not in beta_reductions
+        assert beta_reductions["registered_after_the_view"] == 1.0
+        assert beta_reductions.get("registered_after_the_view") is None
+        assert "registered_after_the_view" not in list(beta_reductions)
+
+    def test__mask_reductions_are_read_only(self, policies):
+        mask_wearing = policies[1]
+        reductions = mask_wearing.apply()
+        assert reductions is mask_wearing.apply()
+        with pytest.raises(TypeError):
+            reductions["pub"] = 1.0
+        mask_wearing.compliance = 0.4
+        mask_wearing._update_group_factors()
+        assert mask_wearing.apply()["pub"] == pytest.approx(1 - 0.4 * 0.5)
+
+    def test__apply_indexed(self, policies):
+        mask_wearing = policies[1]
+        indices, values = mask_wearing.apply_indexed()
+        reductions = mask_wearing.apply()
+        assert indices.dtype == np.int64
+        assert values.dtype == np.float32
+        assert list(indices) == [GROUP_SPEC_TO_ID[spec] for spec in reductions]
+        assert np.allclose(values, list(reductions.values()))
+
+
+class TestActivePolicies:
+    def test__get_active_matches_is_active(self, policies):
+        interaction_policies = InteractionPolicies(policies)
+        for day in range(1, 22):
+            for hour in (0, 13):
+                date = datetime(2020, 3, day, hour)
+                expected = [policy for policy in policies if policy.is_active(date)]
+                assert list(interaction_policies.get_active(date)) == expected
+
+
+def baseline_adoption_probability(policy, person):
+    odds = policy.odds_ratios["intercept"]
+    if person.sex == "m":
+        odds *= policy.odds_ratios["male"]
+    if person.ethnicity == "white":
+        odds *= policy.odds_ratios["white"]
+    if person.income > 70000:
+        odds *= policy.odds_ratios["income_high"]
+    if person.political == "democratic":
+        odds *= policy.odds_ratios["democratic"]
+    if person.perceived_vulnerability:
+        odds *= policy.odds_ratios["vulnerability_high"]
+    return odds / (1 + odds)
+
+
+class TestMaskAdoption:
+    def test__probabilities_match_baseline(self, people):
+        mask_wearing = MaskWearing(
+            start_time="2020-03-05",
+            end_time="2020-03-20",
+            compliance=0.8,
+            beta_factor=0.5,
+            mask_probabilities={"pub": 1.0},
+            behavioral_model=True,
+        )
+        probabilities = mask_wearing.calculate_mask_adoption_probabilities(
+            to_soa(people)
+        )
+        expected = [
+            baseline_adoption_probability(mask_wearing, person) for person in people
+        ]
+        assert np.allclose(probabilities, expected)
+
+    def test__compliance_without_behavioral_model(self, people):
+        mask_wearing = MaskWearing(
+            start_time="2020-03-05",
+            end_time="2020-03-20",
+            compliance=0.8,
+            beta_factor=0.5,
+            mask_probabilities={"pub": 1.0},
+        )
+        probabilities = mask_wearing.calculate_mask_adoption_probabilities(
+            to_soa(people)
+        )
+        assert np.allclose(probabilities, 0.8)
+
+    def test__seeded_draws_are_reproducible(self, people):
+        people_soa = to_soa(people)
+
+        def draw(seed):
+            mask_wearing = MaskWearing(
+                start_time="2020-03-05",
+                end_time="2020-03-20",
+                compliance=0.8,
+                beta_factor=0.5,
+                mask_probabilities={"pub": 1.0},
+                behavioral_model=True,
+                seed=seed,
+            )
+            return [mask_wearing.apply_to_population(people_soa)[0] for _ in range(10)]
+
+        assert np.array_equal(draw(1), draw(1))
+
+    def test__per_person_factor_matches_baseline(self, policies, people, interaction):
+        mask_wearing = policies[1]
+        mask_mult = mask_wearing.per_person_factor(interaction, to_soa(people))
+        assert set(mask_mult) == set(mask_wearing.mask_probabilities)
+        beta_factors = {
+            "m": mask_wearing.beta_factor_male,
+            "f": mask_wearing.beta_factor_female,
+        }
+        for spec, mask_probability in mask_wearing.mask_probabilities.items():
+            for person in people:
+                expected = 1 - (
+                    mask_probability
+                    * mask_wearing.compliance
+                    * (1 - beta_factors[person.sex])
+                )
+                assert mask_mult[spec][person.id] == pytest.approx(expected)
+
+
+class TestPerPersonFactors:
+    def test__mask_reductions_are_not_counted_twice(
+        self, policies, people, interaction
+    ):
+        mask_wearing = policies[1]
+        interaction_policies = InteractionPolicies(policies)
+        interaction_policies.apply(
+            date=datetime(2020, 3, 6),
+            interaction=interaction,
+            people_soa=to_soa(people),
+        )
+        # only social distancing is left in the group reductions
+        assert set(interaction.beta_reductions) == {"pub", "school", "household"}
+        assert interaction.beta_reductions["pub"] == pytest.approx(0.7)
+        assert set(interaction.mask_mult) == set(mask_wearing.mask_probabilities)
+        beta_factors = {
+            "m": mask_wearing.beta_factor_male,
+            "f": mask_wearing.beta_factor_female,
+        }
+        for person in people:
+            group_factor = 1 - 0.8 * (1 - beta_factors[person.sex])
+            assert interaction.beta_reductions["pub"] * interaction.mask_mult["pub"][
+                person.id
+            ] == pytest.approx(0.7 * group_factor)
+
+    def test__behavioral_model_follows_the_last_draw(self, people, interaction):
+        mask_wearing = MaskWearing(
+            start_time="2020-03-05",
+            end_time="2020-03-20",
+            compliance=0.8,
+            beta_factor=0.5,
+            beta_factor_male=0.6,
+            beta_factor_female=0.3,
+            mask_probabilities={"pub": 1.0},
+            behavioral_model=True,
+            seed=0,
+        )
+        interaction_policies = InteractionPolicies([mask_wearing])
+        people_soa = to_soa(people)
+        # nobody has decided yet, so the policy falls back on the group reductions
+        interaction_policies.apply(
+            date=datetime(2020, 3, 6), interaction=interaction, people_soa=people_soa
+        )
+        assert interaction.mask_mult == {}
+        assert interaction.beta_reductions["pub"] == pytest.approx(
+            mask_wearing.apply()["pub"]
+        )
+        reductions = dict(mask_wearing.apply())
+        wears_mask, mask_factor = mask_wearing.apply_to_population(people_soa)
+        interaction_policies.apply(
+            date=datetime(2020, 3, 6), interaction=interaction, people_soa=people_soa
+        )
+        # the draws only act through the per-person factors, and applying the
+        # policies does not draw again
+        assert mask_wearing.apply() == reductions
+        assert "pub" not in interaction.beta_reductions
+        assert set(interaction.mask_mult) == set(interaction.betas)
+        for i, person in enumerate(people):
+            assert interaction.mask_mult["school"][person.id] == mask_factor[i]
+        assert np.allclose(mask_factor[~wears_mask], 1.0)
+
+    def test__ids_missing_from_the_population_are_neutral(
+        self, policies, people, interaction
+    ):
+        mask_wearing = policies[1]
+        # the person with the second id is not part of the population
+        mask_mult = mask_wearing.per_person_factor(
+            interaction, to_soa([people[0], people[2], people[3]])
+        )
+        for spec in mask_wearing.mask_probabilities:
+            assert len(mask_mult[spec]) == people[3].id + 1
+            assert mask_mult[spec][people[1].id] == 1.0
+            assert mask_mult[spec][people[0].id] < 1.0
+        # the sex of each person is shared by all the specs
+        assert mask_mult["pub"].sex_by_id is mask_mult["school"].sex_by_id
+
+    def test__sex_factors_combine_as_arrays(self, policies, people, interaction):
+        mask_wearing = policies[1]
+        interaction_policies = InteractionPolicies([])
+        mask_mult = mask_wearing.per_person_factor(interaction, to_soa(people))
+        combined = interaction_policies._combine_mask_mults(
+            [mask_mult, {"pub": np.full(people[3].id + 1, 0.5)}]
+        )
+        assert np.allclose(combined["pub"], 0.5 * np.asarray(mask_mult["pub"]))
+        assert np.allclose(
+            np.asarray(combined["school"]), np.asarray(mask_mult["school"])
+        )
+
+    def test__no_population(self, policies, interaction):
+        interaction_policies = InteractionPolicies(policies)
+        interaction_policies.apply(date=datetime(2020, 3, 6), interaction=interaction)
+        assert interaction.mask_mult == {}
+
+
+class TestCombineMaskMults:
+    def test__single_policy_is_not_copied(self):
+        interaction_policies = InteractionPolicies([])
+        mask_mult = {"pub": np.array([0.5, 1.0])}
+        assert interaction_policies._combine_mask_mults([mask_mult]) is mask_mult
+
+    def test__multiplies_per_spec(self):
+        interaction_policies = InteractionPolicies([])
+        first = {"pub": np.array([0.5, 1.0]), "school": np.array([0.8, 0.8])}
+        second = {"pub": np.array([0.5, 0.2])}
+        combined = interaction_policies._combine_mask_mults([first, second])
+        assert np.allclose(combined["pub"], [0.25, 0.2])
+        assert np.allclose(combined["school"], [0.8, 0.8])
+        # the inputs are left untouched, and the combination is reused
+        assert np.allclose(first["pub"], [0.5, 1.0])
+        assert interaction_policies._combine_mask_mults([first, second]) is combined
+        third = {"pub": np.array([1.0, 1.0])}
+        assert interaction_policies._combine_mask_mults([first, third]) is not combined
+
+
+class TestMaskKernels:
+    def test__assign_masks(self):
+        rng = np.random.default_rng(0)
+        n_people = 1000
+        sex = rng.integers(0, 3, n_people).astype(np.int8)
+        rand = rng.random(n_people)
+        prob = rng.random(n_people)
+        bf_by_sex = np.array([0.6, 0.3, 0.5], dtype=np.float32)
+        wears_mask = np.empty(n_people, dtype=np.bool_)
+        mask_factor = np.empty(n_people, dtype=np.float32)
+        assign_masks(sex, rand, prob, bf_by_sex, wears_mask, mask_factor)
+        expected_wears = rand < prob
+        expected_factor = np.where(expected_wears, bf_by_sex[sex], 1.0)
+        assert np.array_equal(wears_mask, expected_wears)
+        assert np.allclose(mask_factor, expected_factor)
+
+    def test__mask_adoption_prob(self):
+        rng = np.random.default_rng(0)
+        demo_flags = rng.random((100, 5)) < 0.5
+        log_ratios = np.log([0.4, 0.3, 2.5, 2.5, 3.6])
+        prob = mask_adoption_prob(demo_flags, np.log(4.5), log_ratios)
+        log_odds = np.log(4.5) + demo_flags @ log_ratios
+        assert np.allclose(prob, 1 / (1 + np.exp(-log_odds)))